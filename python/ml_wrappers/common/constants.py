@@ -317,6 +317,7 @@ class Device(Enum):
     """Specifies all possible device types."""
 
     CPU = 'cpu'
+    CUDA = 'cuda'
     GPU = 'gpu'
     AUTO = 'auto'
 
@@ -5,6 +5,12 @@
 """Defines wrappers for vision-based models."""
 
 import logging
+import os
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from functools import lru_cache
 from typing import Any, Dict, Tuple, Union
 
 import numpy as np
@@ -41,11 +47,17 @@ except ImportError:
 
 try:
     import torchvision
-    from torchvision import transforms as T
+    from torchvision.io import ImageReadMode
 except ImportError:
     module_logger.debug('Could not import torchvision, required if ' +
                         'using PytorchDRiseWrapper')
 
+try:
+    from PIL import Image
+except ImportError:
+    module_logger.debug('Could not import PIL, required if predicting ' +
+                        'on image files')
+
 try:
     from mlflow.pyfunc import PyFuncModel
 except ImportError:
@@ -53,10 +65,32 @@ except ImportError:
     module_logger.debug('Could not import mlflow, required if using an ' +
                         'mlflow model')
 
-FASTAI_MODEL_SUFFIX = "fastai.learner.Learner'>"
+FASTAI_LEARNER_MODULE = 'fastai.learner'
+AUTOML_IMAGES_MLFLOW_WRAPPER_MODULE = (
+    'azureml.automl.dnn.vision.common.mlflow.mlflow_model_wrapper')
 BOXES = 'boxes'
 LABELS = 'labels'
 SCORES = 'scores'
+# PIL image modes with 8 bits per channel, which numpy reads as uint8
+PIL_UINT8_MODES = frozenset(['CMYK', 'HSV', 'L', 'LA', 'LAB', 'La', 'P',
+                             'PA', 'RGB', 'RGBA', 'RGBX', 'RGBa', 'YCbCr'])
+
+
+def _get_imported_class(module_name, class_name):
+    """Get a class from a module if the module has already been imported.
+
+    A model can only be an instance of a class whose module has been
+    imported, so there is no need to import large optional packages just
+    to check the type of a model.
+
+    :param module_name: The name of the module defining the class.
+    :type module_name: str
+    :param class_name: The name of the class.
+    :type class_name: str
+    :return: The class, or None if the module has not been imported.
+    :rtype: type
+    """
+    return getattr(sys.modules.get(module_name), class_name, None)
 
 
 def _is_fastai_model(model):
@@ -67,7 +101,51 @@ def _is_fastai_model(model):
     :return: True if the model is a fastai model, False otherwise.
     :rtype: bool
     """
-    return str(type(model)).endswith(FASTAI_MODEL_SUFFIX)
+    learner = _get_imported_class(FASTAI_LEARNER_MODULE, 'Learner')
+    return learner is not None and isinstance(model, learner)
+
+
+def _is_automl_images_mlflow_model(model):
+    """Check if the model is an AutoML for images MLflow model.
+
+    :param model: The mlflow model to check.
+    :type model: mlflow.pyfunc.PyFuncModel
+    :return: True if the model is an AutoML for images MLflow model,
+        False otherwise.
+    :rtype: bool
+    """
+    wrapper = _get_imported_class(AUTOML_IMAGES_MLFLOW_WRAPPER_MODULE,
+                                  'MLFlowImagesModelWrapper')
+    python_model = getattr(model._model_impl, 'python_model', None)
+    return wrapper is not None and isinstance(python_model, wrapper)
+
+
+def _is_torch_tensor(data):
+    """Check if the data is a torch tensor.
+
+    :param data: The data to check.
+    :type data: object
+    :return: True if the data is a torch tensor, False otherwise.
+    :rtype: bool
+    """
+    try:
+        return isinstance(data, torch.Tensor)
+    except NameError:
+        return False
+
+
+def _is_pil_image(data):
+    """Check if the data is a PIL image.
+
+    :param data: The data to check.
+    :type data: object
+    :return: True if the data is a PIL image, False otherwise.
+    :rtype: bool
+    """
+    try:
+        return isinstance(data, Image.Image)
+    except NameError:
+        return False
 
 
 def _filter_score(orig_prediction: dict, score_thresh: float = 0.5):
@@ -110,6 +188,60 @@ def _apply_nms(orig_prediction: dict, iou_thresh: float = 0.5):
     return nms_prediction
 
 
+def _pack_batch_detections(raw_detections: list, image_indices: list,
+                           iou_thresh: float = 0.5,
+                           score_thresh: float = 0.5) -> Tensor:
+    """Filter the predictions of a batch of images and pack them together.
+
+    Predictions with confidence scores <= score_thresh are dropped and nms
+    is performed on the remaining predictions of all images in one call.
+    Boxes are only compared with boxes from the same image, so the result
+    is the same as calling _apply_nms and _filter_score on each image.
+
+    Each row of the result holds a single detection in the format
+    [image_index, label, x1, y1, x2, y2, score].
+
+    :param raw_detections: Model predictions for each image in the batch
+    :type raw_detections: list[dict]
+    :param image_indices: Index of each image of the batch in the dataset
+    :type image_indices: list[int]
+    :param iou_thresh: iou_threshold for nms
+    :type iou_thresh: float
+    :param score_thresh: Score threshold to filter by
+    :type score_thresh: float
+    :return: Packed detections sorted by decreasing score
+    :rtype: torch.Tensor
+    """
+    device = raw_detections[0][BOXES].device
+    counts = torch.tensor([len(detection[BOXES])
+                           for detection in raw_detections], device=device)
+    # batched_nms offsets the boxes of each group by a multiple of the group
+    # id, so the ids are kept small by using the position in the batch to
+    # avoid losing float precision for images late in a large dataset
+    detection_images = torch.repeat_interleave(
+        torch.arange(len(raw_detections), device=device), counts)
+    # boxes and scores are float16 if the model ran under autocast
+    boxes = torch.cat([detection[BOXES]
+                       for detection in raw_detections]).float()
+    scores = torch.cat([detection[SCORES]
+                        for detection in raw_detections]).float()
+    labels = torch.cat([detection[LABELS] for detection in raw_detections])
+
+    # Filtering before nms gives the same result, since a box can only be
+    # suppressed by a box with a higher score
+    keep = scores > score_thresh
+    boxes, scores = boxes[keep], scores[keep]
+    labels, detection_images = labels[keep], detection_images[keep]
+
+    keep = torchvision.ops.batched_nms(boxes, scores, detection_images,
+                                       iou_thresh)
+    image_indices = torch.tensor(image_indices, device=device)
+    return torch.cat((image_indices[detection_images[keep]].unsqueeze(1),
+                      labels[keep].unsqueeze(1),
+                      boxes[keep],
+                      scores[keep].unsqueeze(1)), dim=1)
+
+
 def _process_automl_detections_to_raw_detections(
         image_detections,
         label_dict: Dict[str, int],
@@ -220,10 +352,377 @@ def expand_class_scores(
     return expanded_scores
 
 
+def _image_to_tensor(image) -> Tensor:
+    """Convert an image to a tensor with the channels first.
+
+    Unlike torchvision's ToTensor, uint8 images are kept as uint8 so that
+    fewer bytes need to be copied to the device. The conversion to float
+    is done on the device by _convert_image_dtype. PIL images that numpy
+    does not read as uint8, such as binary or 16-bit images, are converted
+    by ToTensor instead. Image files are decoded by torchvision directly
+    into uint8 tensors, without going through PIL.
+
+    :param image: The image to convert, or the path to an image file
+    :type image: numpy.ndarray or PIL.Image.Image or torch.Tensor or str
+    :return: The image as a tensor of shape [C, H, W]
+    :rtype: torch.Tensor
+    """
+    if isinstance(image, Tensor):
+        return image
+    if isinstance(image, (str, os.PathLike)):
+        return torchvision.io.read_image(os.fspath(image),
+                                         mode=ImageReadMode.RGB)
+    if _is_pil_image(image) and image.mode not in PIL_UINT8_MODES:
+        # numpy reads e.g. binary images as bool, let ToTensor convert them
+        return torchvision.transforms.functional.to_tensor(image)
+    image = np.asarray(image)
+    if not image.flags.writeable:
+        image = image.copy()
+    if image.ndim == 2:
+        # add channel to end of image if 2D grayscale
+        image = image[:, :, np.newaxis]
+    return torch.from_numpy(image).permute(2, 0, 1)
+
+
+def _get_image_shape(image) -> Tuple[int, ...]:
+    """Get the shape of the tensor _image_to_tensor returns for an image.
+
+    The shape is read without converting the image, so that images are
+    only converted when their batch is loaded. Image files are not
+    decoded, only their header is read to get the size of the image.
+
+    :param image: The image, or the path to an image file
+    :type image: numpy.ndarray or PIL.Image.Image or torch.Tensor or str
+    :return: The shape of the image as a tensor
+    :rtype: tuple
+    """
+    if isinstance(image, Tensor):
+        return tuple(image.shape)
+    if isinstance(image, (str, os.PathLike)):
+        # Image.open only reads the header until the image data is accessed
+        with Image.open(image) as image_file:
+            width, height = image_file.size
+        # image files are always read in RGB mode
+        return (3, height, width)
+    if isinstance(image, np.ndarray):
+        shape = image.shape
+    elif _is_pil_image(image):
+        width, height = image.size
+        shape = (height, width, len(image.getbands()))
+    else:
+        shape = np.asarray(image).shape
+    if len(shape) == 2:
+        # grayscale images get a single channel
+        return (1,) + shape
+    height, width, channels = shape
+    return (channels, height, width)
+
+
+def _get_image_batch_key(image) -> Tuple[Tuple[int, ...], Any, Any]:
+    """Get the key of the images an image can be stacked into a batch with.
+
+    Only images with the same shape, dtype and device can be stacked, since
+    torch.stack would otherwise promote uint8 images to floats without
+    scaling them or fail for images on different devices.
+
+    :param image: The image, or the path to an image file
+    :type image: numpy.ndarray or PIL.Image.Image or torch.Tensor or str
+    :return: The shape, dtype and device of the image as a tensor
+    :rtype: tuple
+    """
+    shape = _get_image_shape(image)
+    if isinstance(image, Tensor):
+        return shape, image.dtype, image.device
+    if isinstance(image, (str, os.PathLike)):
+        dtype = torch.uint8
+    elif _is_pil_image(image):
+        # Only images in rare modes that ToTensor converts are converted
+        # here to get their dtype
+        dtype = (torch.uint8 if image.mode in PIL_UINT8_MODES
+                 else _image_to_tensor(image).dtype)
+    else:
+        if not isinstance(image, np.ndarray):
+            image = np.asarray(image)
+        dtype = torch.from_numpy(np.empty(0, dtype=image.dtype)).dtype
+    return shape, dtype, torch.device('cpu')
+
+
+def _convert_image_dtype(images: Tensor) -> Tensor:
+    """Scale uint8 images to floats in the range [0, 1].
+
+    Matches the scaling done by torchvision's ToTensor. Images that are
+    not uint8 are returned unchanged.
+
+    :param images: The images to convert
+    :type images: torch.Tensor
+    :return: The converted images
+    :rtype: torch.Tensor
+    """
+    if images.dtype == torch.uint8:
+        return images.float().div_(255.0)
+    return images
+
+
+def _load_image_batch(images: list, batch_indices: list, device,
+                      copy_stream=None):
+    """Convert a batch of images, stack them and copy them to the device.
+
+    Image files are decoded here, so only the images of the batches being
+    loaded and run are held in memory.
+
+    On CUDA devices the copy of images on the cpu is issued from pinned
+    memory on copy_stream, so that it can overlap with the computation on
+    the current stream. Images that are already on a CUDA device can't be
+    pinned and are moved on the current stream instead.
+
+    :param images: List of images, or paths to image files
+    :type images: list
+    :param batch_indices: Indices of the images in the batch
+    :type batch_indices: list[int]
+    :param device: The device to copy the batch to
+    :type device: torch.device
+    :param copy_stream: CUDA stream to copy the batch on
+    :type copy_stream: torch.cuda.Stream
+    :return: The batch on the device and an event recorded once the batch
+        is ready, or None if the batch is not on a CUDA device
+    :rtype: tuple(torch.Tensor, torch.cuda.Event)
+    """
+    batch = torch.stack([_image_to_tensor(images[index])
+                         for index in batch_indices])
+    if copy_stream is None or batch.device.type != 'cpu':
+        batch = batch.to(device)
+        if batch.device.type != 'cuda':
+            return batch, None
+        # The batch was stacked on the current stream of this thread, the
+        # model runs on another stream and needs to wait for it
+        ready = torch.cuda.Event()
+        ready.record(torch.cuda.current_stream(batch.device))
+        return batch, ready
+    batch = batch.pin_memory()
+    with torch.cuda.stream(copy_stream):
+        batch = batch.to(device, non_blocking=True)
+        copied = torch.cuda.Event()
+        copied.record(copy_stream)
+    return batch, copied
+
+
+# Number of threads in _cudnn_benchmark and the mode to restore once they
+# have all left it
+_cudnn_benchmark_lock = threading.Lock()
+_cudnn_benchmark_users = 0
+_cudnn_benchmark_previous = False
+
+
+@contextmanager
+def _cudnn_benchmark(enabled: bool):
+    """Enable cuDNN benchmark mode and restore the previous mode on exit.
+
+    Lets cuDNN pick the fastest convolution algorithms for the input
+    shape, without changing the setting for the user's other models.
+    Only worth enabling when all inputs have the same shape, since the
+    algorithms are benchmarked again for every new shape.
+
+    The mode is process-wide, so calls from different threads are counted
+    and the previous mode is only restored when the last one exits.
+
+    :param enabled: Whether to enable benchmark mode
+    :type enabled: bool
+    """
+    global _cudnn_benchmark_users, _cudnn_benchmark_previous
+    if not enabled:
+        yield
+        return
+    with _cudnn_benchmark_lock:
+        if _cudnn_benchmark_users == 0:
+            _cudnn_benchmark_previous = torch.backends.cudnn.benchmark
+            torch.backends.cudnn.benchmark = True
+        _cudnn_benchmark_users += 1
+    try:
+        yield
+    finally:
+        with _cudnn_benchmark_lock:
+            _cudnn_benchmark_users -= 1
+            if _cudnn_benchmark_users == 0:
+                torch.backends.cudnn.benchmark = _cudnn_benchmark_previous
+
+
+def _get_image_batches(keys: list, batch_size: int):
+    """Group the images into batches of images with the same batch key.
+
+    Images with the same shape, dtype and device can be stacked into a
+    single tensor and passed to the model in one forward pass. The original
+    position of each image is kept so that predictions can be returned in
+    input order.
+
+    :param keys: Batch key of each image from _get_image_batch_key
+    :type keys: list[tuple]
+    :param batch_size: Maximum number of images in a single batch
+    :type batch_size: int
+    :return: Batches of indices into the list of images
+    :rtype: list[list[int]]
+    """
+    if batch_size < 1:
+        raise ValueError("batch_size must be a positive integer")
+    key_groups = {}
+    for index, key in enumerate(keys):
+        key_groups.setdefault(key, []).append(index)
+
+    batches = []
+    for indices in key_groups.values():
+        for start in range(0, len(indices), batch_size):
+            batches.append(indices[start:start + batch_size])
+    return batches
+
+
+class _ImageModelKind(object):
+    """Provide constants for the kinds of image models that can be wrapped."""
+
+    AUTOML_MLFLOW = 'automl_mlflow'
+    FASTAI = 'fastai'
+    MLFLOW = 'mlflow'
+    PIPELINE = 'pipeline'
+    PYTORCH = 'pytorch'
+
+
+def _get_image_model_kind(model):
+    """Get the kind of the image model to pick the wrapper for it.
+
+    :param model: The model or function to wrap.
+    :type model: function or model to wrap
+    :return: The kind of the model, or None if it is not a known kind.
+    :rtype: str
+    """
+    try:
+        if isinstance(model, nn.Module):
+            return _ImageModelKind.PYTORCH
+    except (NameError, AttributeError):
+        module_logger.debug(
+            'Could not import torch, required if using a pytorch model'
+        )
+    if _is_fastai_model(model):
+        return _ImageModelKind.FASTAI
+    if hasattr(model, '_model_impl'):
+        if _is_automl_images_mlflow_model(model):
+            return _ImageModelKind.AUTOML_MLFLOW
+        return _ImageModelKind.MLFLOW
+    if _is_transformers_pipeline(model) or _is_callable_pipeline(model):
+        return _ImageModelKind.PIPELINE
+    return None
+
+
+def _wrap_pytorch_image_classification_model(model, examples, model_task,
+                                             number_of_classes, classes,
+                                             device, use_amp):
+    """Wrap a PyTorch image classification model.
+
+    See _wrap_image_model for a description of the parameters.
+    """
+    model = WrappedPytorchModel(model, image_to_tensor=True)
+    if not isinstance(examples, DatasetWrapper):
+        examples = DatasetWrapper(examples)
+    eval_function, eval_ml_domain = _eval_model(
+        model, examples, model_task)
+    return (
+        WrappedClassificationModel(model, eval_function, examples),
+        eval_ml_domain,
+    )
+
+
+def _wrap_fastai_image_classification_model(model, examples, model_task,
+                                            number_of_classes, classes,
+                                            device, use_amp):
+    """Wrap a fastai image classification model.
+
+    See _wrap_image_model for a description of the parameters.
+    """
+    multilabel = model_task == ModelTask.MULTILABEL_IMAGE_CLASSIFICATION
+    return (WrappedFastAIImageClassificationModel(model,
+                                                  multilabel=multilabel),
+            model_task)
+
+
+def _wrap_automl_image_classification_model(model, examples, model_task,
+                                            number_of_classes, classes,
+                                            device, use_amp):
+    """Wrap an AutoML for images MLflow classification model.
+
+    See _wrap_image_model for a description of the parameters.
+    """
+    return WrappedMlflowAutomlImagesClassificationModel(model), model_task
+
+
+def _wrap_transformer_image_classification_model(model, examples,
+                                                 model_task,
+                                                 number_of_classes, classes,
+                                                 device, use_amp):
+    """Wrap a transformers or callable image classification pipeline.
+
+    See _wrap_image_model for a description of the parameters.
+    """
+    return WrappedTransformerImageClassificationModel(model), model_task
+
+
+def _wrap_automl_object_detection_model(model, examples, model_task,
+                                        number_of_classes, classes, device,
+                                        use_amp):
+    """Wrap an AutoML for images MLflow object detection model.
+
+    See _wrap_image_model for a description of the parameters.
+    """
+    return WrappedMlflowAutomlObjectDetectionModel(model, classes), model_task
+
+
+def _wrap_object_detection_model(model, examples, model_task,
+                                 number_of_classes, classes, device,
+                                 use_amp):
+    """Wrap a PyTorch object detection model.
+
+    See _wrap_image_model for a description of the parameters.
+    """
+    return (WrappedObjectDetectionModel(model, number_of_classes, device,
+                                        use_amp=use_amp),
+            model_task)
+
+
+def _leave_image_model_unwrapped(model, examples, model_task,
+                                 number_of_classes, classes, device,
+                                 use_amp):
+    """Return the model as is.
+
+    See _wrap_image_model for a description of the parameters.
+    """
+    return model, model_task
+
+
+# Maps the model task and the kind of model to the function that wraps it
+_IMAGE_MODEL_WRAPPERS = {
+    (ModelTask.IMAGE_CLASSIFICATION, _ImageModelKind.PYTORCH):
+        _wrap_pytorch_image_classification_model,
+    (ModelTask.IMAGE_CLASSIFICATION, _ImageModelKind.FASTAI):
+        _wrap_fastai_image_classification_model,
+    (ModelTask.IMAGE_CLASSIFICATION, _ImageModelKind.AUTOML_MLFLOW):
+        _wrap_automl_image_classification_model,
+    (ModelTask.IMAGE_CLASSIFICATION, _ImageModelKind.PIPELINE):
+        _wrap_transformer_image_classification_model,
+    (ModelTask.MULTILABEL_IMAGE_CLASSIFICATION, _ImageModelKind.FASTAI):
+        _wrap_fastai_image_classification_model,
+    (ModelTask.OBJECT_DETECTION, _ImageModelKind.AUTOML_MLFLOW):
+        _wrap_automl_object_detection_model,
+    (ModelTask.OBJECT_DETECTION, _ImageModelKind.MLFLOW):
+        _leave_image_model_unwrapped,
+}
+
+# Wrapper for each model task when there is none for the kind of model
+_DEFAULT_IMAGE_MODEL_WRAPPERS = {
+    ModelTask.OBJECT_DETECTION: _wrap_object_detection_model,
+}
+
+
 def _wrap_image_model(model, examples, model_task, is_function,
                       number_of_classes: int = None,
                       classes: Union[list, np.array] = None,
-                      device=Device.AUTO.value):
+                      device=Device.AUTO.value,
+                      use_amp: bool = None):
     """If needed, wraps the model or function in a common API.
 
     Wraps the model based on model task and prediction function contract.
@@ -247,57 +746,37 @@ def _wrap_image_model(model, examples, model_task, is_function,
     :param device: optional parameter specifying the device to move the model
         to.
     :type device: str
+    :param use_amp: optional parameter specifying whether to run object
+        detection models in float16 with autocast. Only supported on cuda
+        devices. If not specified, autocast is used when the model is on
+        cuda. Set to False to run the model in its own precision.
+    :type use_amp: bool
     :return: The function chosen from given model and chosen domain, or
     model wrapping the function and chosen domain.
     :rtype: (function, str) or (model, str)
     """
     device = _get_device(device)
-    _wrapped_model = model
-    if model_task == ModelTask.IMAGE_CLASSIFICATION:
-        try:
-            if isinstance(model, nn.Module):
-                model = WrappedPytorchModel(model, image_to_tensor=True)
-                if not isinstance(examples, DatasetWrapper):
-                    examples = DatasetWrapper(examples)
-                eval_function, eval_ml_domain = _eval_model(
-                    model, examples, model_task)
-                return (
-                    WrappedClassificationModel(model, eval_function, examples),
-                    eval_ml_domain,
-                )
-        except (NameError, AttributeError):
-            module_logger.debug(
-                'Could not import torch, required if using a pytorch model'
-            )
+    model_kind = _get_image_model_kind(model)
+    wrap_function = _IMAGE_MODEL_WRAPPERS.get(
+        (model_task, model_kind),
+        _DEFAULT_IMAGE_MODEL_WRAPPERS.get(model_task,
+                                          _leave_image_model_unwrapped))
+    return wrap_function(model, examples, model_task, number_of_classes,
+                         classes, device, use_amp)
 
-        if _is_fastai_model(model):
-            _wrapped_model = WrappedFastAIImageClassificationModel(model)
-        elif hasattr(model, '_model_impl'):
-            if str(type(model._model_impl.python_model)).endswith(
-                ("azureml.automl.dnn.vision.common.mlflow." +
-                    "mlflow_model_wrapper.MLFlowImagesModelWrapper'>")
-            ):
-                _wrapped_model = WrappedMlflowAutomlImagesClassificationModel(
-                    model)
-        elif _is_transformers_pipeline(model) or _is_callable_pipeline(model):
-            _wrapped_model = WrappedTransformerImageClassificationModel(model)
-    elif model_task == ModelTask.MULTILABEL_IMAGE_CLASSIFICATION:
-        if _is_fastai_model(model):
-            _wrapped_model = WrappedFastAIImageClassificationModel(
-                model, multilabel=True
-            )
-    elif model_task == ModelTask.OBJECT_DETECTION:
-        if hasattr(model, '_model_impl'):
-            if str(type(model._model_impl.python_model)).endswith(
-                ("azureml.automl.dnn.vision.common.mlflow." +
-                    "mlflow_model_wrapper.MLFlowImagesModelWrapper'>")
-            ):
-                _wrapped_model = WrappedMlflowAutomlObjectDetectionModel(
-                    model, classes)
-        else:
-            _wrapped_model = WrappedObjectDetectionModel(
-                model, number_of_classes, device)
-    return _wrapped_model, model_task
+
+@lru_cache(maxsize=None)
+def _get_auto_device() -> str:
+    """Get the device to run computations on when device is set to "auto".
+
+    The result is cached, so that CUDA availability is only checked once
+    instead of every time a model is wrapped.
+
+    :return: cuda (GPU) if available, otherwise cpu
+    :rtype: str
+    """
+    return (Device.CUDA.value if torch.cuda.is_available()
+            else Device.CPU.value)
 
 
 def _get_device(device: str) -> str:
@@ -316,8 +795,7 @@ def _get_device(device: str) -> str:
        or type(device) == int
        or device is None):
         if device == Device.AUTO.value:
-            return (Device.CUDA.value if torch.cuda.is_available()
-                    else Device.CPU.value)
+            return _get_auto_device()
         return device
     raise ValueError("Selected device is invalid")
 
@@ -337,7 +815,12 @@ class WrappedTransformerImageClassificationModel(object):
         :return: The predicted values.
         :rtype: numpy.ndarray
         """
-        return np.argmax(self._model(dataset), axis=1)
+        predictions = self._model(dataset)
+        if _is_torch_tensor(predictions):
+            # Take the argmax on the device to avoid copying all the
+            # probabilities to the host
+            return predictions.argmax(dim=1).cpu().numpy()
+        return np.argmax(predictions, axis=1)
 
     def predict_proba(self, dataset):
         """Predict the output probability using the Transformers model.
@@ -378,6 +861,8 @@ class WrappedFastAIImageClassificationModel(object):
         """
         # Note predict for single image requires 3d instead of 4d array
         if len(dataset.shape) == 4:
+            if hasattr(self._model, 'dls'):
+                return self._fastai_predict_batch(dataset, index)
             predictions = []
             for row in dataset:
                 predictions.append(self._fastai_predict(row, index))
@@ -395,6 +880,31 @@ class WrappedFastAIImageClassificationModel(object):
                     predictions = predictions.astype(int)
             return predictions
 
+    def _fastai_predict_batch(self, dataset, index):
+        """Predict the output on a batch of images using the FastAI model.
+
+        Runs inference on batches of images through a test DataLoader
+        instead of calling predict once per image.
+
+        :param dataset: The dataset of images to predict on.
+        :type dataset: numpy.ndarray
+        :param index: The index into the predicted data.
+            Index 1 is for the predicted class and index
+            2 is for the predicted probability.
+        :type index: int
+        :return: The predicted data.
+        :rtype: numpy.ndarray
+        """
+        test_dl = self._model.dls.test_dl(list(dataset), num_workers=0)
+        probabilities, _, decoded = self._model.get_preds(
+            dl=test_dl, with_decoded=True)
+        if index == 2:
+            return probabilities.numpy()
+        predictions = decoded.numpy()
+        if predictions.dtype == bool:
+            predictions = predictions.astype(int)
+        return predictions
+
     def predict(self, dataset):
         """Predict the output value using the wrapped FastAI model.
 
@@ -447,8 +957,7 @@ class WrappedMlflowAutomlImagesClassificationModel:
         :return: The predicted values.
         :rtype: numpy.ndarray
         """
-        predictions = self._mlflow_predict(dataset)
-        return predictions.loc[:, 'probs'].map(lambda x: np.argmax(x)).values
+        return self.predict_proba(dataset).argmax(axis=1)
 
     def predict_proba(self, dataset: pd.DataFrame) -> np.ndarray:
         """Predict the output probability using the MLflow model.
@@ -459,7 +968,7 @@ class WrappedMlflowAutomlImagesClassificationModel:
         :rtype: numpy.ndarray
         """
         predictions = self._mlflow_predict(dataset)
-        return np.stack(predictions.probs.values)
+        return np.asarray(predictions['probs'].tolist())
 
 
 class WrappedObjectDetectionModel:
@@ -469,7 +978,8 @@ class WrappedObjectDetectionModel:
     def __init__(self,
                  model: Any,
                  number_of_classes: int,
-                 device=Device.AUTO.value) -> None:
+                 device=Device.AUTO.value,
+                 use_amp: bool = None) -> None:
         """Initialize the WrappedObjectDetectionModel with the model
             and evaluation function.
 
@@ -480,19 +990,135 @@ class WrappedObjectDetectionModel:
         :param device: optional parameter specifying the device to move the
             model to. If not specified, then cpu is the default
         :type device: str
+        :param use_amp: optional parameter specifying whether to run the
+            model in float16 with autocast. Only supported on cuda devices.
+            If not specified, autocast is used when the model is on cuda.
+            Set to False to run the model in its own precision
+        :type use_amp: bool
         """
         self._device = torch.device(_get_device(device))
+        is_cuda = self._device.type == 'cuda'
+        self._use_amp = is_cuda if use_amp is None else use_amp and is_cuda
         model.eval()
         model.to(self._device)
 
         self._model = model
         self._number_of_classes = number_of_classes
 
-    def predict(self, x, iou_thresh: float = 0.5, score_thresh: float = 0.5):
+    def _predict_batch(self, batch: Tensor, copied, batch_indices: list,
+                       iou_thresh: float, score_thresh: float) -> Tensor:
+        """Run the model on a batch of images on the current stream.
+
+        :param batch: The batch of images on the device
+        :type batch: torch.Tensor
+        :param copied: Event recorded after the batch was copied to the
+            device, or None if the copy was synchronous
+        :type copied: torch.cuda.Event
+        :param batch_indices: Index of each image of the batch in the
+            dataset
+        :type batch_indices: list[int]
+        :param iou_thresh: iou_threshold for nms
+        :type iou_thresh: float
+        :param score_thresh: Score threshold to filter by
+        :type score_thresh: float
+        :return: Packed detections of the batch
+        :rtype: torch.Tensor
+        """
+        if copied is not None:
+            current_stream = torch.cuda.current_stream(self._device)
+            current_stream.wait_event(copied)
+            batch.record_stream(current_stream)
+        batch = _convert_image_dtype(batch)
+        with torch.autocast(device_type='cuda', dtype=torch.float16,
+                            enabled=self._use_amp):
+            raw_detections = self._model(batch)
+        return _pack_batch_detections(raw_detections, batch_indices,
+                                      iou_thresh, score_thresh)
+
+    def _predict_detections(self, x, iou_thresh: float = 0.5,
+                            score_thresh: float = 0.5, batch_size: int = 8):
+        """Predict the detections for each image as a numpy array.
+
+        Images with the same shape are stacked and passed to the model in
+        mini-batches of at most batch_size images.
+
+        :param x: The images, or paths to the image files
+        :type x: list or numpy.ndarray or torch.Tensor
+        :param iou_thresh: iou_threshold for nms
+        :type iou_thresh: float
+        :param score_thresh: Score threshold to filter by
+        :type score_thresh: float
+        :param batch_size: Maximum number of images passed to the model in
+            a single forward pass
+        :type batch_size: int
+        :return: Detections of each image, one row per detection in the
+            format [label, x1, y1, x2, y2, score]
+        :rtype: list[numpy.ndarray]
+        """
+        images = list(x)
+        if not images:
+            return []
+        keys = [_get_image_batch_key(image) for image in images]
+        batches = _get_image_batches(keys, batch_size)
+        # cuDNN benchmarks the algorithms again for every new input shape,
+        # which only pays off if all the images have the same shape
+        shapes = set(shape for shape, _, _ in keys)
+        benchmark = self._device.type == 'cuda' and len(shapes) == 1
+        copy_stream = None
+        compute_streams = [None]
+        if self._device.type == 'cuda':
+            copy_stream = torch.cuda.Stream(self._device)
+            # Alternate batches between two streams, so that the work of
+            # one batch can overlap with the computation of the previous
+            # one, e.g. for images of different sizes that can't be batched
+            compute_streams = [torch.cuda.Stream(self._device)
+                               for _ in range(2)]
+        batch_predictions = []
+        # Load the next batch on a background thread while the model
+        # runs on the current batch
+        with torch.inference_mode(), \
+                _cudnn_benchmark(benchmark), \
+                ThreadPoolExecutor(max_workers=1) as executor:
+            next_batch = executor.submit(_load_image_batch, images,
+                                         batches[0], self._device,
+                                         copy_stream)
+            for batch_number, batch_indices in enumerate(batches):
+                batch, copied = next_batch.result()
+                if batch_number + 1 < len(batches):
+                    next_batch = executor.submit(
+                        _load_image_batch, images, batches[batch_number + 1],
+                        self._device, copy_stream)
+                compute_stream = compute_streams[
+                    batch_number % len(compute_streams)]
+                # torch.cuda.stream is a no-op for the None stream on cpu
+                with torch.cuda.stream(compute_stream):
+                    batch_predictions.append(self._predict_batch(
+                        batch, copied, batch_indices, iou_thresh,
+                        score_thresh))
+
+            if copy_stream is not None:
+                current_stream = torch.cuda.current_stream(self._device)
+                for compute_stream in compute_streams:
+                    current_stream.wait_stream(compute_stream)
+            # Copy the detections of all images to the host at once
+            all_predictions = torch.cat(batch_predictions).cpu().numpy()
+        # Group the detections by image, the stable sort keeps the
+        # detections of each image sorted by decreasing score
+        all_predictions = all_predictions[
+            np.argsort(all_predictions[:, 0], kind='stable')]
+        counts = np.bincount(all_predictions[:, 0].astype(int),
+                             minlength=len(images))
+        return np.split(all_predictions[:, 1:], np.cumsum(counts)[:-1])
+
+    def predict(self, x, iou_thresh: float = 0.5, score_thresh: float = 0.5,
+                batch_size: int = 8):
         """Create a list of detection records from the image predictions.
 
-        :param x: Tensor of the image
-        :type x: torch.Tensor
+        :param x: The images, or paths to the image files
+        :type x: list or numpy.ndarray or torch.Tensor
+        :param batch_size: Maximum number of images passed to the model in
+            a single forward pass
+        :type batch_size: int
         :return: Baseline detections to get saliency maps for
         :rtype: List of Detection Records
 
@@ -514,27 +1140,9 @@ class WrappedObjectDetectionModel:
         ]
 
         """
-        detections = []
-        for image in x:
-            if type(image) == Tensor:
-                raw_detections = self._model(
-                    image.to(self._device).unsqueeze(0))
-            else:
-                raw_detections = self._model(
-                    T.ToTensor()(image).to(self._device).unsqueeze(0))
-
-            for raw_detection in raw_detections:
-                raw_detection = _apply_nms(raw_detection, .5)
-                raw_detection = _filter_score(raw_detection)
-                image_predictions = torch.cat((raw_detection["labels"]
-                                               .unsqueeze(1),
-                                               raw_detection["boxes"],
-                                               raw_detection["scores"]
-                                               .unsqueeze(1)), dim=1)
-
-                detections.append(image_predictions.detach().cpu().numpy()
-                                  .tolist())
-        return detections
+        detections = self._predict_detections(x, iou_thresh, score_thresh,
+                                              batch_size)
+        return [image_detections.tolist() for image_detections in detections]
 
     def predict_proba(self, dataset, iou_threshold=0.1):
         """Predict the output probability using the wrapped model.
@@ -544,11 +1152,12 @@ class WrappedObjectDetectionModel:
         :param iou_threshold: amount of acceptable error.
             objects with error scores higher than the threshold will be removed
         :type iou_threshold: float
+        :return: The confidence scores of the detections in each image.
+        :rtype: list
         """
-        predictions = self.predict(dataset, iou_threshold)
-        prob_scores = [[pred.class_scores for pred in image_prediction]
-                       for image_prediction in predictions]
-        return prob_scores
+        detections = self._predict_detections(dataset, iou_threshold)
+        return [image_detections[:, -1].tolist()
+                for image_detections in detections]
 
 
 class WrappedMlflowAutomlObjectDetectionModel:
@@ -586,36 +1195,21 @@ class WrappedMlflowAutomlObjectDetectionModel:
         predictions = self._model.predict(dataset)
         return predictions
 
-    def predict(self, dataset: pd.DataFrame, iou_thresh: float = 0.5,
-                score_thresh: float = 0.5):
-        """Create a list of detection records from the image predictions.
-
-        Below is example Label (y) representation for a cohort of 2 images,
-        with 3 objects detected for the first image and 1 for the second image.
-
-        [
-         [
-            [class, topX, topY, bottomX, bottomY, (optional) confidence_score],
-            [class, topX, topY, bottomX, bottomY, (optional) confidence_score],
-            [class, topX, topY, bottomX, bottomY, (optional) confidence_score],
-         ],
-         [
-            [class, topX, topY, bottomX, bottomY, (optional) confidence_score],
-         ]
-
-        ]
+    def _predict_detections(self, dataset: pd.DataFrame,
+                            iou_thresh: float = 0.5,
+                            score_thresh: float = 0.5):
+        """Predict the detections for each image as a numpy array.
 
         :param dataset: The dataset to predict on.
         :type dataset: pandas.DataFrame
-        :param iou_thresh: Intersection-over-Union (IoU) threshold for NMS (or
-                           the amount of acceptable error). Objects with error
-                           cores higher than the threshold will be removed.
+        :param iou_thresh: Intersection-over-Union (IoU) threshold for NMS.
         :type iou_thresh: float
         :param score_thresh: Threshold to filter detections based on
                             predicted confidence scores.
         :type score_thresh: float
-        :return: Final detections from the object detector
-        :rtype: List of Detection Records
+        :return: Detections of each image, one row per detection in the
+            format [class, topX, topY, bottomX, bottomY, score]
+        :rtype: list[numpy.ndarray]
         """
         image_sizes = dataset['image_size']
 
@@ -645,11 +1239,45 @@ class WrappedMlflowAutomlObjectDetectionModel:
                 dim=1
             )
 
-            detections.append(
-                image_predictions.detach().cpu().numpy().tolist())
+            detections.append(image_predictions.detach().cpu().numpy())
 
         return detections
 
+    def predict(self, dataset: pd.DataFrame, iou_thresh: float = 0.5,
+                score_thresh: float = 0.5):
+        """Create a list of detection records from the image predictions.
+
+        Below is example Label (y) representation for a cohort of 2 images,
+        with 3 objects detected for the first image and 1 for the second image.
+
+        [
+         [
+            [class, topX, topY, bottomX, bottomY, (optional) confidence_score],
+            [class, topX, topY, bottomX, bottomY, (optional) confidence_score],
+            [class, topX, topY, bottomX, bottomY, (optional) confidence_score],
+         ],
+         [
+            [class, topX, topY, bottomX, bottomY, (optional) confidence_score],
+         ]
+
+        ]
+
+        :param dataset: The dataset to predict on.
+        :type dataset: pandas.DataFrame
+        :param iou_thresh: Intersection-over-Union (IoU) threshold for NMS (or
+                           the amount of acceptable error). Objects with error
+                           cores higher than the threshold will be removed.
+        :type iou_thresh: float
+        :param score_thresh: Threshold to filter detections based on
+                            predicted confidence scores.
+        :type score_thresh: float
+        :return: Final detections from the object detector
+        :rtype: List of Detection Records
+        """
+        detections = self._predict_detections(dataset, iou_thresh,
+                                              score_thresh)
+        return [image_detections.tolist() for image_detections in detections]
+
     def predict_proba(self, dataset: pd.DataFrame,
                       iou_thresh=0.1) -> np.ndarray:
         """Predict the output probability using the MLflow model.
@@ -663,10 +1291,9 @@ class WrappedMlflowAutomlObjectDetectionModel:
         :rtype: numpy.ndarray
         """
 
-        predictions = self.predict(dataset, iou_thresh=iou_thresh)
-        prob_scores = [[pred[-1] for pred in image_prediction]
-                       for image_prediction in predictions]
-        return prob_scores
+        detections = self._predict_detections(dataset, iou_thresh=iou_thresh)
+        return [image_detections[:, -1].tolist()
+                for image_detections in detections]
 
 
 class PytorchDRiseWrapper(GeneralObjectDetectionModelWrapper):
@@ -45,7 +45,7 @@ except ImportError:
 
 def wrap_model(model, examples, model_task: str = ModelTask.UNKNOWN,
                num_classes: int = None, classes: Union[list, np.array] = None,
-               device=Device.AUTO.value):
+               device=Device.AUTO.value, use_amp: bool = None):
     """If needed, wraps the model in a common API based on model task and
         prediction function contract.
 
@@ -74,6 +74,11 @@ def wrap_model(model, examples, model_task: str = ModelTask.UNKNOWN,
     :param device: optional parameter specifying the device to move the model
         to. If not specified, then cpu is the default
     :type device: str, for instance: 'cpu', 'cuda'
+    :param use_amp: optional parameter specifying whether to run object
+        detection models in float16 with autocast. Only supported on cuda
+        devices. If not specified, autocast is used when the model is on
+        cuda. Set to False to run the model in its own precision.
+    :type use_amp: bool
     :return: The wrapper model.
     :rtype: model
     """
@@ -86,7 +91,7 @@ def wrap_model(model, examples, model_task: str = ModelTask.UNKNOWN,
     if model_task in image_model_tasks:
         return _wrap_image_model(model, examples, model_task,
                                  False,  num_classes, classes,
-                                 device)[0]
+                                 device, use_amp)[0]
     return _wrap_model(model, examples, model_task, False)[0]
 
 
@@ -25,6 +25,31 @@ except ImportError:
                         ' a vision PyTorch model')
 
 
+def _image_batch_to_tensor(images):
+    """Convert a batch of images to a tensor in a single operation.
+
+    Equivalent to applying torchvision's ToTensor to each image and
+    stacking the results: the channel is moved to the second dimension,
+    a channel is added for 2D grayscale images and uint8 images are
+    scaled to floats in the range [0, 1].
+
+    :param images: The images as an array of shape [N, H, W, C] or
+        [N, H, W] for grayscale images.
+    :type images: numpy.ndarray
+    :return: The images as a tensor of shape [N, C, H, W].
+    :rtype: torch.Tensor
+    """
+    if images.ndim == 3:
+        # add channel to end of image if 2D grayscale
+        images = images[:, :, :, np.newaxis]
+    if not images.flags.writeable:
+        images = images.copy()
+    tensor = torch.from_numpy(images).permute(0, 3, 1, 2).contiguous()
+    if tensor.dtype == torch.uint8:
+        return tensor.float().div_(255)
+    return tensor
+
+
 class WrappedPytorchModel(object):
     """A class for wrapping a PyTorch model.
 
@@ -48,6 +73,8 @@ class WrappedPytorchModel(object):
         # Set eval automatically for user for batchnorm and dropout layers
         self._model.eval()
         self._image_to_tensor = image_to_tensor
+        if image_to_tensor:
+            self._to_tensor = ToTensor()
 
     def _convert_to_tensor(self, dataset):
         """Convert the dataset to a pytorch tensor.
@@ -78,19 +105,23 @@ class WrappedPytorchModel(object):
         # If not already tensor, convert
         if not isinstance(dataset, torch.Tensor):
             if self._image_to_tensor:
-                # For torchvision images, can only convert one
-                # image at a time
                 # Note pytorch wrapper expects extra dimension for rows
                 # to be expanded in evaluator for image case,
                 # otherwise this code won't work for a single
                 # image input to predict call
-                rows = []
-                for row in range(dataset.shape[0]):
-                    instance = dataset[row]
-                    if not isinstance(instance, torch.Tensor):
-                        instance = ToTensor()(instance)
-                    rows.append(instance)
-                dataset = torch.stack(rows)
+                if (isinstance(dataset, np.ndarray) and
+                        dataset.dtype != object and dataset.ndim in (3, 4)):
+                    dataset = _image_batch_to_tensor(dataset)
+                else:
+                    # For torchvision images, can only convert one
+                    # image at a time
+                    rows = []
+                    for row in range(dataset.shape[0]):
+                        instance = dataset[row]
+                        if not isinstance(instance, torch.Tensor):
+                            instance = self._to_tensor(instance)
+                        rows.append(instance)
+                    dataset = torch.stack(rows)
             else:
                 dataset = torch.Tensor(dataset)
         return dataset
@@ -27,6 +27,7 @@ try:
 except (ImportError, SyntaxError):
     # Skip for older versions of python due to breaking changes in fastai
     pass
+import torch
 from raiutils.common.retries import retry_function
 from tensorflow.keras.applications.resnet50 import ResNet50, preprocess_input
 from torch import Tensor
@@ -345,6 +346,70 @@ def preprocess_imagenet_dataset(dataset):
     return preprocess(Tensor(np.moveaxis(dataset, -1, 0)))
 
 
+class FixedDetectionsModel(torch.nn.Module):
+    """Object detection model that returns fixed detections for each image.
+
+    Each image is filled with a single uint8 value that identifies it and
+    the model returns the detections registered for that identifier, in
+    the output format of the torchvision detection models.
+    """
+
+    def __init__(self, detections):
+        """Initialize the FixedDetectionsModel.
+
+        :param detections: Boxes, scores and labels for each image identifier
+        :type detections: dict
+        """
+        super(FixedDetectionsModel, self).__init__()
+        self.detections = detections
+        self.batch_shapes = []
+
+    def forward(self, images):
+        self.batch_shapes.append(tuple(images.shape))
+        outputs = []
+        for image in images:
+            image_id = int(round(image[0, 0, 0].item() * 255))
+            boxes, scores, labels = self.detections[image_id]
+            device = image.device
+            outputs.append({
+                'boxes': torch.tensor(boxes, dtype=torch.float32,
+                                      device=device).reshape(-1, 4),
+                'scores': torch.tensor(scores, dtype=torch.float32,
+                                       device=device),
+                'labels': torch.tensor(labels, dtype=torch.int64,
+                                       device=device)})
+        return outputs
+
+
+def create_fixed_detections_dataset():
+    """Create images of mixed shapes and a model with fixed detections.
+
+    The detections include overlapping boxes of the same and of different
+    classes, scores below the threshold and an image without detections.
+
+    :return: The images and the model
+    :rtype: tuple(list[numpy.ndarray], FixedDetectionsModel)
+    """
+    detections = {
+        1: ([[10, 10, 50, 50], [12, 12, 52, 52], [60, 60, 90, 90]],
+            [0.9, 0.8, 0.7], [1, 1, 2]),
+        2: ([], [], []),
+        3: ([[0, 0, 20, 20], [5, 5, 25, 25], [30, 30, 40, 40],
+             [31, 31, 41, 41]],
+            [0.4, 0.95, 0.6, 0.55], [3, 2, 1, 4]),
+        4: ([[10, 10, 30, 30]], [0.3], [4]),
+        5: ([[5, 5, 15, 15], [40, 40, 45, 45]], [0.65, 0.85], [2, 3]),
+        6: ([[1, 1, 9, 9], [2, 2, 9, 9], [20, 20, 30, 30]],
+            [0.7, 0.75, 0.51], [1, 2, 1]),
+        7: ([[0, 0, 10, 10]], [0.99], [4]),
+    }
+    shapes = {1: (40, 60), 2: (32, 32), 3: (40, 60), 4: (32, 32),
+              5: (40, 60), 6: (50, 50), 7: (32, 32)}
+    images = [np.full(shapes[image_id] + (3,), image_id, dtype=np.uint8)
+              for image_id in sorted(shapes)]
+    return images, FixedDetectionsModel(detections)
+
+
 def load_object_fridge_dataset_labels():
 
     src_images = "./data/odFridgeObjects/"
@@ -10,7 +10,8 @@ import numpy as np
 import pandas as pd
 import pytest
 import torchvision
-from common_vision_utils import (IMAGE, create_image_classification_pipeline,
+from common_vision_utils import (IMAGE, create_fixed_detections_dataset,
+                                 create_image_classification_pipeline,
                                  create_pytorch_image_model,
                                  create_scikit_classification_pipeline,
                                  load_fridge_dataset, load_imagenet_dataset,
@@ -20,7 +21,16 @@ from common_vision_utils import (IMAGE, create_image_classification_pipeline,
                                  retrieve_or_train_fridge_model)
 from ml_wrappers import wrap_model
 from ml_wrappers.common.constants import ModelTask
-from ml_wrappers.model.image_model_wrapper import PytorchDRiseWrapper
+from ml_wrappers.model.image_model_wrapper import (PytorchDRiseWrapper,
+                                                   WrappedObjectDetectionModel,
+                                                   _apply_nms,
+                                                   _convert_image_dtype,
+                                                   _cudnn_benchmark,
+                                                   _filter_score,
+                                                   _get_image_shape,
+                                                   _image_to_tensor,
+                                                   _pack_batch_detections)
+from PIL import Image
 from wrapper_validator import (validate_wrapped_classification_model,
                                validate_wrapped_multilabel_model,
                                validate_wrapped_object_detection_custom_model,
@@ -34,6 +44,21 @@ except ImportError:
     print('Could not import torchvision, required if using a vision PyTorch model')
 
 
+def get_per_image_detections(model, images, iou_thresh, score_thresh):
+    """Get the detections of each image by running the model per image."""
+    detections = []
+    for image in images:
+        raw_detection = model(T.ToTensor()(image).unsqueeze(0))[0]
+        raw_detection = _apply_nms(raw_detection, iou_thresh)
+        raw_detection = _filter_score(raw_detection, score_thresh)
+        image_predictions = torch.cat((raw_detection["labels"].unsqueeze(1),
+                                       raw_detection["boxes"],
+                                       raw_detection["scores"].unsqueeze(1)),
+                                      dim=1)
+        detections.append(image_predictions.numpy().tolist())
+    return detections
+
+
 @pytest.mark.usefixtures('_clean_dir')
 class TestImageModelWrapper(object):
     def test_wrap_resnet_classification_model(self):
@@ -42,6 +67,24 @@ class TestImageModelWrapper(object):
         wrapped_model = wrap_model(pred, data, ModelTask.IMAGE_CLASSIFICATION)
         validate_wrapped_classification_model(wrapped_model, data)
 
+    def test_wrap_torch_tensor_classification_pipeline(self):
+        data = np.zeros((4, 8, 8, 3), dtype=np.uint8)
+        probs = torch.tensor([[0.1, 0.7, 0.2],
+                              [0.6, 0.3, 0.1],
+                              [0.2, 0.2, 0.6],
+                              [0.3, 0.4, 0.3]])
+
+        def pipeline(images):
+            return probs[:len(images)]
+
+        wrapped_model = wrap_model(pipeline, data,
+                                   ModelTask.IMAGE_CLASSIFICATION)
+        predictions = wrapped_model.predict(data)
+        assert isinstance(predictions, np.ndarray)
+        assert np.issubdtype(predictions.dtype, np.integer)
+        np.testing.assert_array_equal(predictions,
+                                      np.argmax(probs.numpy(), axis=1))
+
     def test_wrap_scikit_classification_model(self):
         data = load_imagenet_dataset()
         pred = create_scikit_classification_pipeline()
@@ -146,3 +189,168 @@ class TestImageModelWrapper(object):
         validate_wrapped_object_detection_custom_model(wrapped_model,
                                                        T.ToTensor()(data[0])
                                                        .repeat(2, 1, 1, 1))
+
+    def test_pytorch_object_detection_model_batch_size(self):
+        images, model = create_fixed_detections_dataset()
+        wrapped_model = wrap_model(model, images, ModelTask.OBJECT_DETECTION)
+        single_predictions = wrapped_model.predict(images, batch_size=1)
+        assert all(shape[0] == 1 for shape in model.batch_shapes)
+        assert len(model.batch_shapes) == len(images)
+
+        model.batch_shapes = []
+        batched_predictions = wrapped_model.predict(images, batch_size=2)
+        # images are grouped by shape into batches of at most 2 images
+        assert model.batch_shapes == [(2, 3, 40, 60), (1, 3, 40, 60),
+                                      (2, 3, 32, 32), (1, 3, 32, 32),
+                                      (1, 3, 50, 50)]
+        assert batched_predictions == single_predictions
+        assert len(batched_predictions) == len(images)
+        # the second image has no detections
+        assert batched_predictions[1] == []
+        assert all(len(predictions) > 0
+                   for predictions in batched_predictions[:1] +
+                   batched_predictions[2:3])
+
+    # Skip for older versions of pytorch due to missing classes
+    @pytest.mark.skipif(sys.version_info.minor <= 6,
+                        reason='Older versions of pytorch not supported')
+    def test_pytorch_object_detection_model_image_paths(self):
+        data = load_object_fridge_dataset()[:3]
+        image_paths = list(data[IMAGE])
+        images = load_images(data)
+        model = torchvision.models.detection.fasterrcnn_resnet50_fpn()
+        in_features = model.roi_heads.box_predictor.cls_score.in_features
+        model.roi_heads.box_predictor = FastRCNNPredictor(in_features, 5)
+        wrapped_model = wrap_model(model, images, ModelTask.OBJECT_DETECTION)
+        validate_wrapped_object_detection_model(wrapped_model, image_paths)
+
+    @pytest.mark.skipif(not torch.cuda.is_available(),
+                        reason='CUDA is not available')
+    def test_pytorch_object_detection_model_cuda_tensors(self):
+        images, model = create_fixed_detections_dataset()
+        wrapped_model = WrappedObjectDetectionModel(model, 4, device='cuda')
+        cuda_images = [T.ToTensor()(image).cuda() for image in images]
+        assert (wrapped_model.predict(cuda_images, batch_size=2) ==
+                wrapped_model.predict(images, batch_size=2))
+        # images of the same shape on different devices are not stacked
+        mixed_images = [cuda_image if index % 2 else image
+                        for index, (image, cuda_image)
+                        in enumerate(zip(images, cuda_images))]
+        assert (wrapped_model.predict(mixed_images, batch_size=2) ==
+                wrapped_model.predict(images, batch_size=2))
+
+    def test_pytorch_object_detection_model_mixed_inputs(self):
+        images, model = create_fixed_detections_dataset()
+        wrapped_model = wrap_model(model, images, ModelTask.OBJECT_DETECTION)
+        # uint8 images of the same shape as float images must not be
+        # stacked with them, or they would reach the model unscaled
+        mixed_images = [[image, T.ToTensor()(image),
+                         Image.fromarray(image)][index % 3]
+                        for index, image in enumerate(images)]
+        assert (wrapped_model.predict(mixed_images) ==
+                wrapped_model.predict(images))
+
+    @pytest.mark.parametrize('batch_size', [1, 2, 3, 8])
+    @pytest.mark.parametrize(('iou_thresh', 'score_thresh'),
+                             [(0.5, 0.5), (0.1, 0.5), (0.5, 0.6)])
+    def test_pytorch_object_detection_model_matches_per_image_nms(
+            self, batch_size, iou_thresh, score_thresh):
+        images, model = create_fixed_detections_dataset()
+        wrapped_model = wrap_model(model, images, ModelTask.OBJECT_DETECTION)
+        predictions = wrapped_model.predict(images, iou_thresh=iou_thresh,
+                                            score_thresh=score_thresh,
+                                            batch_size=batch_size)
+        expected = get_per_image_detections(model, images, iou_thresh,
+                                            score_thresh)
+        assert predictions == expected
+
+    def test_pack_batch_detections_large_image_indices(self):
+        # batched_nms offsets boxes by their group id, which loses float
+        # precision for small boxes far from the origin if the index of the
+        # image in the dataset is used as the group id
+        torch.manual_seed(0)
+        image_indices = [100000, 100001]
+        for _ in range(20):
+            raw_detections = []
+            for _ in image_indices:
+                corners = torch.rand(30, 2) * 100 + 900
+                sizes = torch.rand(30, 2) * 20 + 1
+                raw_detections.append({
+                    'boxes': torch.cat((corners, corners + sizes), dim=1),
+                    'scores': torch.rand(30),
+                    'labels': torch.randint(1, 5, (30,))})
+            packed = _pack_batch_detections(
+                [dict(detection) for detection in raw_detections],
+                image_indices, 0.5, 0.5)
+            for image_index, raw_detection in zip(image_indices,
+                                                  raw_detections):
+                raw_detection = _apply_nms(raw_detection, 0.5)
+                raw_detection = _filter_score(raw_detection, 0.5)
+                image_detections = packed[packed[:, 0] == image_index]
+                assert torch.equal(image_detections[:, 1],
+                                   raw_detection['labels'].float())
+                assert torch.equal(image_detections[:, 2:6],
+                                   raw_detection['boxes'])
+                assert torch.equal(image_detections[:, 6],
+                                   raw_detection['scores'])
+
+    @pytest.mark.parametrize('mode', ['RGB', 'RGBA', 'L', 'P'])
+    def test_get_image_shape(self, mode):
+        pixels = np.random.randint(0, 256, (20, 30, 3), dtype=np.uint8)
+        pil_image = Image.fromarray(pixels).convert(mode)
+        array_image = np.asarray(pil_image)
+        tensor_image = torch.from_numpy(pixels).permute(2, 0, 1)
+        for image in [pil_image, array_image, tensor_image]:
+            assert (_get_image_shape(image) ==
+                    tuple(_image_to_tensor(image).shape))
+
+    @pytest.mark.parametrize('mode', ['1', 'L', 'RGB', 'I', 'I;16', 'F'])
+    def test_image_to_tensor_matches_to_tensor(self, mode):
+        pixels = np.random.randint(0, 256, (20, 30), dtype=np.uint8)
+        image = Image.fromarray(pixels).convert(mode)
+        tensor = _convert_image_dtype(_image_to_tensor(image))
+        expected = T.ToTensor()(image)
+        assert tensor.dtype == expected.dtype
+        assert torch.equal(tensor, expected)
+
+    def test_cudnn_benchmark_overlapping_calls(self):
+        previous = torch.backends.cudnn.benchmark
+        torch.backends.cudnn.benchmark = False
+        try:
+            first = _cudnn_benchmark(True)
+            second = _cudnn_benchmark(True)
+            first.__enter__()
+            second.__enter__()
+            assert torch.backends.cudnn.benchmark
+            # the calls exit in a different order than they entered
+            first.__exit__(None, None, None)
+            assert torch.backends.cudnn.benchmark
+            second.__exit__(None, None, None)
+            assert not torch.backends.cudnn.benchmark
+            with _cudnn_benchmark(False):
+                assert not torch.backends.cudnn.benchmark
+        finally:
+            torch.backends.cudnn.benchmark = previous
+
+    def test_pytorch_object_detection_model_predict_proba(self):
+        images, model = create_fixed_detections_dataset()
+        wrapped_model = wrap_model(model, images, ModelTask.OBJECT_DETECTION)
+        probabilities = wrapped_model.predict_proba(images)
+        expected = get_per_image_detections(model, images, 0.1, 0.5)
+        assert probabilities == [[detection[-1] for detection in detections]
+                                 for detections in expected]
+
+    @pytest.mark.skipif(not torch.cuda.is_available(),
+                        reason='CUDA is not available')
+    def test_pytorch_object_detection_model_use_amp(self):
+        images, model = create_fixed_detections_dataset()
+        wrapped_model = wrap_model(model, images, ModelTask.OBJECT_DETECTION,
+                                   device='cuda')
+        assert wrapped_model._use_amp
+        wrapped_model = wrap_model(model, images, ModelTask.OBJECT_DETECTION,
+                                   device='cuda', use_amp=False)
+        assert not wrapped_model._use_amp
+        predictions = wrapped_model.predict(images)
+        model.to('cpu')
+        assert predictions == get_per_image_detections(model, images, 0.5,
+                                                       0.5)
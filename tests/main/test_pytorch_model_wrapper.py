@@ -4,15 +4,29 @@
 
 """Tests for WrappedPytorchModel"""
 
+import numpy as np
 import pytest
 from common_utils import (create_pytorch_multiclass_classifier,
                           create_pytorch_regressor)
 from ml_wrappers.common.constants import ModelTask
 from ml_wrappers.model import WrappedPytorchModel
+from ml_wrappers.model.pytorch_wrapper import _image_batch_to_tensor
 from train_wrapper_utils import (train_classification_model_numpy,
                                  train_regression_model_numpy)
 from wrapper_validator import validate_wrapped_pytorch_model
 
+try:
+    import torch
+    from torchvision.transforms import ToTensor
+except ImportError:
+    pass
+
+
+def create_read_only_images():
+    images = np.random.randint(0, 256, size=(4, 8, 6, 3), dtype=np.uint8)
+    images.flags.writeable = False
+    return images
+
 
 @pytest.mark.usefixtures('_clean_dir')
 class TestPytorchModelWrapper(object):
@@ -30,6 +44,21 @@ class TestPytorchModelWrapper(object):
         train_regression_model_numpy(
             wrapped_init, housing)
 
+    @pytest.mark.parametrize('create_images', [
+        lambda: np.random.randint(0, 256, size=(4, 8, 6, 3), dtype=np.uint8),
+        lambda: np.random.randint(0, 256, size=(4, 8, 6), dtype=np.uint8),
+        lambda: np.random.rand(4, 8, 6, 3).astype(np.float32),
+        create_read_only_images])
+    def test_image_batch_to_tensor_matches_to_tensor(self, create_images):
+        images = create_images()
+        to_tensor = ToTensor()
+        expected = torch.stack([to_tensor(image) for image in images])
+        tensor = _image_batch_to_tensor(images)
+        assert tensor.dtype == expected.dtype
+        assert tensor.shape == expected.shape
+        assert tensor.is_contiguous()
+        assert torch.equal(tensor, expected)
+
 
 class PytorchModelInitializer():
     def __init__(self, model_initializer, model_task):